@@ -37,8 +37,18 @@ class AppConfig:
     feishu: FeishuConfig = FeishuConfig()
     webhook_url: str = os.getenv("FEISHU_WEBHOOK_URL", "")  # 飞书群机器人Webhook
     webhook_secret: str = os.getenv("FEISHU_WEBHOOK_SECRET", "")  # 若开启“签名校验”，填写机器人密钥；否则留空
+    # Webhook 失败信息中附带签名时间戳与北京时间，便于排查签名/时钟问题（1/true 开启）
+    webhook_debug: bool = os.getenv("FEISHU_WEBHOOK_DEBUG", "").strip().lower() in ("1", "true", "yes")
     # 运行期产物（excel/yaml/log）的目录，默认为当前文件所在目录下的 runs
     runtime_dir: str = os.getenv("RUNTIME_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "runs"))
+    # 交给 XTF 的中间文件格式：xlsx（默认）或 parquet；parquet 需安装 pyarrow 且声明 XTF_SUPPORTS_PARQUET，否则告警并回退 xlsx
+    xtf_input_format: str = os.getenv("XTF_INPUT_FORMAT", "xlsx").strip().lower()
+    # 显式声明所部署的 XTF 版本可读取 Parquet 输入（1/true 开启）
+    xtf_supports_parquet: bool = os.getenv("XTF_SUPPORTS_PARQUET", "").strip().lower() in ("1", "true", "yes")
+    # 可选：Celery 消息代理（如 redis://127.0.0.1:6379/0），留空则在调度进程内直接执行任务
+    celery_broker_url: str = os.getenv("CELERY_BROKER_URL", "")
+    celery_result_backend: str = os.getenv("CELERY_RESULT_BACKEND", "")
+    celery_queue: str = os.getenv("CELERY_QUEUE", "mtb_sync")
 
 
 CONFIG = AppConfig()
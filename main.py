@@ -2,47 +2,45 @@
 # -*- coding: utf-8 -*-
 
 from datetime import datetime
-from typing import Dict
+from typing import Tuple
+import functools
 import os
 
 from flask import Flask, request, redirect, url_for, render_template, flash
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-try:
-    # Python 3.9+ 标准库
-    from zoneinfo import ZoneInfo
-except Exception:
-    ZoneInfo = None
 
-from models import init_db, SessionLocal, SyncTask, SyncLog
-from sync_runner import run_task
+from models import init_db, SessionLocal, SyncTask, SyncLog, TZ_CN
+from sync_runner import dispatch_task
 
 app = Flask(__name__)
 app.secret_key = "dev-secret"
+# 执行线程池按 CPU 数定界；misfire_grace_time 让延迟触发的任务仍补跑一次，而不是被静默丢弃
+SCHEDULER_OPTIONS = {
+    "executors": {"default": ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 4) * 2))},
+    "job_defaults": {"max_instances": 1, "coalesce": True, "misfire_grace_time": 300},
+}
 # 以北京时区运行调度（确保 cron 在北京时间触发）
-if ZoneInfo:
-    scheduler = BackgroundScheduler(
-        timezone=ZoneInfo("Asia/Shanghai"),
-        job_defaults={"max_instances": 1, "coalesce": True},
-    )
+if TZ_CN:
+    scheduler = BackgroundScheduler(timezone=TZ_CN, **SCHEDULER_OPTIONS)
 else:
-    scheduler = BackgroundScheduler(
-        job_defaults={"max_instances": 1, "coalesce": True},
-    )
+    scheduler = BackgroundScheduler(**SCHEDULER_OPTIONS)
 
 
-def parse_cron_expr(expr: str) -> Dict:
-    # 支持标准5段: "m h dom mon dow"
+@functools.lru_cache(maxsize=1024)
+def parse_cron_expr(expr: str) -> Tuple[Tuple[str, str], ...]:
+    # 支持标准5段: "m h dom mon dow"；返回可哈希的 (字段, 值) 元组以便缓存，调用方用 dict(...) 还原
     parts = expr.strip().split()
     if len(parts) != 5:
         raise ValueError("cron_expr 需为5段表达式，如: 0 3 * * *")
-    return {
-        "minute": parts[0],
-        "hour": parts[1],
-        "day": parts[2],
-        "month": parts[3],
-        "day_of_week": parts[4],
-    }
+    return (
+        ("minute", parts[0]),
+        ("hour", parts[1]),
+        ("day", parts[2]),
+        ("month", parts[3]),
+        ("day_of_week", parts[4]),
+    )
 
 
 def upsert_job(task: SyncTask):
@@ -56,17 +54,17 @@ def upsert_job(task: SyncTask):
     if not bool(getattr(task, "enabled", True)):
         return
     # 注册新任务
-    trigger_kwargs = parse_cron_expr(task.cron_expr)
-    if ZoneInfo:
+    trigger_kwargs = dict(parse_cron_expr(task.cron_expr))
+    if TZ_CN:
         scheduler.add_job(
-            run_task,
-            CronTrigger(timezone=ZoneInfo("Asia/Shanghai"), **trigger_kwargs),
+            dispatch_task,
+            CronTrigger(timezone=TZ_CN, **trigger_kwargs),
             id=job_id,
             args=[task.id],
             replace_existing=True,
         )
     else:
-        scheduler.add_job(run_task, CronTrigger(**trigger_kwargs), id=job_id, args=[task.id], replace_existing=True)
+        scheduler.add_job(dispatch_task, CronTrigger(**trigger_kwargs), id=job_id, args=[task.id], replace_existing=True)
 
 
 def cn_time(dt: datetime) -> str:
@@ -78,9 +76,8 @@ def cn_time(dt: datetime) -> str:
     if not dt:
         return "-"
     try:
-        if ZoneInfo and getattr(dt, "tzinfo", None) is not None:
-            tz_cn = ZoneInfo("Asia/Shanghai")
-            cn_dt = dt.astimezone(tz_cn)
+        if TZ_CN and getattr(dt, "tzinfo", None) is not None:
+            cn_dt = dt.astimezone(TZ_CN)
             return cn_dt.strftime("%Y-%m-%d %H:%M:%S")
         else:
             # naive 或无 zoneinfo：直接按本地格式输出（数据库里存的即为北京时间）
@@ -92,34 +89,58 @@ def cn_time(dt: datetime) -> str:
 app.jinja_env.filters["cn_time"] = cn_time
 
 
+@app.teardown_appcontext
+def shutdown_session(exc=None):
+    # 每个请求结束（含异常路径）都归还连接
+    SessionLocal.remove()
+
+
+# 首页任务列表每页条数
+TASKS_PAGE_SIZE = 50
+
+
 @app.route("/")
 def index():
+    page = max(request.args.get("page", 1, type=int), 1)
     session = SessionLocal()
-    tasks = session.query(SyncTask).order_by(SyncTask.id.desc()).all()
+    # 按主键倒序分页；多取一条用于判断是否还有下一页
+    tasks = (
+        session.query(SyncTask)
+        .order_by(SyncTask.id.desc())
+        .limit(TASKS_PAGE_SIZE + 1)
+        .offset((page - 1) * TASKS_PAGE_SIZE)
+        .all()
+    )
+    has_next = len(tasks) > TASKS_PAGE_SIZE
+    tasks = tasks[:TASKS_PAGE_SIZE]
     logs = session.query(SyncLog).order_by(SyncLog.id.desc()).limit(20).all()
-    session.close()
-    return render_template("tasks_list.html", tasks=tasks, logs=logs)
+    return render_template("tasks_list.html", tasks=tasks, logs=logs, page=page, has_next=has_next)
 
 
 @app.route("/tasks/new", methods=["GET", "POST"])
 def new_task():
     if request.method == "POST":
         session = SessionLocal()
-        task = SyncTask(
-            name=request.form.get("name") or "未命名任务",
-            sql_text=request.form.get("sql_text") or "SELECT 1",
-            feishu_link=request.form.get("feishu_link") or "",
-            target_type="bitable",
-            sync_mode=request.form.get("sync_mode") or "full",
-            index_column=request.form.get("index_column") or "id",
-            field_type_strategy=request.form.get("field_type_strategy") or "base",
-            create_missing_fields=bool(request.form.get("create_missing_fields", "true") == "true"),
-            enabled=True,
-            cron_expr=request.form.get("cron_expr") or "0 3 * * *",
-            last_run_status=None,
-        )
-        session.add(task)
-        session.commit()
+        try:
+            task = SyncTask(
+                name=request.form.get("name") or "未命名任务",
+                sql_text=request.form.get("sql_text") or "SELECT 1",
+                feishu_link=request.form.get("feishu_link") or "",
+                target_type="bitable",
+                sync_mode=request.form.get("sync_mode") or "full",
+                index_column=request.form.get("index_column") or "id",
+                field_type_strategy=request.form.get("field_type_strategy") or "base",
+                create_missing_fields=bool(request.form.get("create_missing_fields", "true") == "true"),
+                enabled=True,
+                cron_expr=request.form.get("cron_expr") or "0 3 * * *",
+                last_run_status=None,
+            )
+        except ValueError as e:
+            # cron_expr 在模型层校验，非法表达式在提交时即被拒绝
+            flash(f"任务未创建：{e}", "warning")
+            return redirect(url_for("index"))
+        with session.begin():
+            session.add(task)
         upsert_job(task)
         flash("任务已创建并注册调度", "success")
         return redirect(url_for("index"))
@@ -129,31 +150,34 @@ def new_task():
 @app.route("/tasks/<int:task_id>/edit", methods=["GET", "POST"])
 def edit_task(task_id: int):
     session = SessionLocal()
-    task = session.query(SyncTask).get(task_id)
-    if not task:
-        session.close()
-        return "Task not found", 404
+    # 成功时提交、异常时回滚，连接随事务结束归还
+    try:
+        with session.begin():
+            task = session.get(SyncTask, task_id)
+            if not task:
+                return "Task not found", 404
+            if request.method == "POST":
+                task.name = request.form.get("name") or task.name
+                task.sql_text = request.form.get("sql_text") or task.sql_text
+                task.feishu_link = request.form.get("feishu_link") or task.feishu_link
+                task.sync_mode = request.form.get("sync_mode") or task.sync_mode
+                task.index_column = request.form.get("index_column") or task.index_column
+                task.field_type_strategy = request.form.get("field_type_strategy") or task.field_type_strategy
+                task.create_missing_fields = bool(request.form.get("create_missing_fields", "true") == "true")
+                task.cron_expr = request.form.get("cron_expr") or task.cron_expr
+    except ValueError as e:
+        flash(f"任务未更新：{e}", "warning")
+        return redirect(url_for("index"))
     if request.method == "POST":
-        task.name = request.form.get("name") or task.name
-        task.sql_text = request.form.get("sql_text") or task.sql_text
-        task.feishu_link = request.form.get("feishu_link") or task.feishu_link
-        task.sync_mode = request.form.get("sync_mode") or task.sync_mode
-        task.index_column = request.form.get("index_column") or task.index_column
-        task.field_type_strategy = request.form.get("field_type_strategy") or task.field_type_strategy
-        task.create_missing_fields = bool(request.form.get("create_missing_fields", "true") == "true")
-        task.cron_expr = request.form.get("cron_expr") or task.cron_expr
-        session.commit()
         upsert_job(task)
-        session.close()
         flash("任务已更新并重新注册调度", "success")
         return redirect(url_for("index"))
-    session.close()
     return render_template("task_form.html", task=task)
 
 
 @app.route("/tasks/<int:task_id>/run", methods=["POST"])
 def run_now(task_id: int):
-    scheduler.add_job(run_task, id=f"run_once_{task_id}_{datetime.utcnow().timestamp()}", args=[task_id], replace_existing=False)
+    scheduler.add_job(dispatch_task, id=f"run_once_{task_id}_{datetime.utcnow().timestamp()}", args=[task_id], replace_existing=False)
     flash("已触发后台执行", "info")
     return redirect(url_for("index"))
 
@@ -161,13 +185,12 @@ def run_now(task_id: int):
 @app.route("/tasks/<int:task_id>/toggle", methods=["POST"])
 def toggle_task(task_id: int):
     session = SessionLocal()
-    task = session.query(SyncTask).get(task_id)
-    if not task:
-        session.close()
-        flash("任务不存在", "warning")
-        return redirect(url_for("index"))
-    task.enabled = not bool(getattr(task, "enabled", True))
-    session.commit()
+    with session.begin():
+        task = session.get(SyncTask, task_id)
+        if not task:
+            flash("任务不存在", "warning")
+            return redirect(url_for("index"))
+        task.enabled = not bool(getattr(task, "enabled", True))
     # 更新调度
     if task.enabled:
         upsert_job(task)
@@ -178,26 +201,23 @@ def toggle_task(task_id: int):
         except Exception:
             pass
         flash("任务已禁用并移除调度", "info")
-    session.close()
     return redirect(url_for("index"))
 
 
 @app.route("/tasks/<int:task_id>/delete", methods=["POST"])
 def delete_task(task_id: int):
     session = SessionLocal()
-    task = session.query(SyncTask).get(task_id)
-    if not task:
-        session.close()
-        flash("任务不存在", "warning")
-        return redirect(url_for("index"))
-    # 移除调度
+    with session.begin():
+        task = session.get(SyncTask, task_id)
+        if not task:
+            flash("任务不存在", "warning")
+            return redirect(url_for("index"))
+        session.delete(task)
+    # 删除提交后再移除调度
     try:
-        scheduler.remove_job(f"task_{task.id}")
+        scheduler.remove_job(f"task_{task_id}")
     except Exception:
         pass
-    session.delete(task)
-    session.commit()
-    session.close()
     flash("任务已删除", "success")
     return redirect(url_for("index"))
 
@@ -211,19 +231,21 @@ def bootstrap():
             upsert_job(task)
         except Exception as e:
             # 忽略单个任务的调度错误，便于系统整体启动
-            pass
-    session.close()
+            print(f"⚠️ 任务 {task.id} 调度注册失败，已跳过: {e}")
+    SessionLocal.remove()
 
 
 if __name__ == "__main__":
-    bootstrap()
-    # 仅在主进程中启动调度器，避免 Flask debug 模式下的双进程重复调度
-    should_start_scheduler = (not app.debug) or (os.environ.get("WERKZEUG_RUN_MAIN") == "true")
-    if should_start_scheduler:
+    debug = True
+    # debug 模式下重载器先起监控父进程，再以 WERKZEUG_RUN_MAIN=true 拉起实际服务的子进程；
+    # 建表补列、任务注册与调度器只在服务进程中执行，避免双进程重复初始化与重复调度
+    is_serving_process = (not debug) or (os.environ.get("WERKZEUG_RUN_MAIN") == "true")
+    if is_serving_process:
+        bootstrap()
         try:
             scheduler.start()
         except Exception:
             pass
-    app.run(host="0.0.0.0", port=8000, debug=True)
+    app.run(host="0.0.0.0", port=8000, debug=debug)
 
 
@@ -7,7 +7,8 @@ from typing import Optional
 from sqlalchemy import (
     Column, Integer, String, Text, DateTime, Boolean, Enum, create_engine, inspect, text as sa_text
 )
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.orm import declarative_base, scoped_session, sessionmaker, validates
+from apscheduler.triggers.cron import CronTrigger
 
 try:
     from zoneinfo import ZoneInfo
@@ -19,14 +20,16 @@ except ImportError:
 
 from config import CONFIG
 
+# 北京时区（无 zoneinfo 时为 None）
+TZ_CN = ZoneInfo("Asia/Shanghai") if ZoneInfo else None
+
 Base = declarative_base()
 
 
 def now_cn_naive():
     """返回北京时间的 naive datetime（无时区信息），用于数据库存储"""
-    if ZoneInfo:
-        tz_cn = ZoneInfo("Asia/Shanghai")
-        return datetime.now(tz=tz_cn).replace(tzinfo=None)
+    if TZ_CN:
+        return datetime.now(tz=TZ_CN).replace(tzinfo=None)
     # Fallback: 假定服务器时间已是合理时间，或者接受 UTC 偏差
     return datetime.now()
 
@@ -53,6 +56,15 @@ class SyncTask(Base):
     last_run_status = Column(String(32), nullable=True)
     updated_at = Column(DateTime, nullable=False, default=now_cn_naive, onupdate=now_cn_naive)
 
+    @validates("cron_expr")
+    def validate_cron_expr(self, key, value):
+        # 赋值时即校验，非法表达式在表单提交时被拒绝，而不是到注册调度时才失败
+        try:
+            CronTrigger.from_crontab(value, timezone=TZ_CN)
+        except (ValueError, TypeError, AttributeError) as e:
+            raise ValueError(f"cron_expr 无效: {value!r}（{e}）")
+        return value
+
 
 class SyncLog(Base):
     __tablename__ = "sync_logs"
@@ -67,49 +79,61 @@ class SyncLog(Base):
 
 
 def create_db_engine():
-    return create_engine(CONFIG.mysql.sqlalchemy_url(), pool_pre_ping=True, pool_recycle=1800)
+    return create_engine(
+        CONFIG.mysql.sqlalchemy_url(),
+        pool_size=10,
+        max_overflow=20,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+    )
 
 
 ENGINE = create_db_engine()
-SessionLocal = sessionmaker(bind=ENGINE, autoflush=False, expire_on_commit=False)
+# 线程级 Session：Web 请求结束时由 teardown 钩子 remove，调度线程在任务结束时 remove
+SessionLocal = scoped_session(sessionmaker(bind=ENGINE, autoflush=False, expire_on_commit=False))
+
+
+_DB_INITIALIZED = False
 
 
 def init_db():
+    global _DB_INITIALIZED
+    # 同一进程内只初始化一次（多处调用 bootstrap/init_db 时）；该标记不跨进程，
+    # Flask debug 重载的监控父进程由 main.py 入口按 WERKZEUG_RUN_MAIN 跳过初始化
+    if _DB_INITIALIZED:
+        return
     Base.metadata.create_all(bind=ENGINE)
-    # 轻量自适应：若缺少 task_name 字段则自动补齐
+    # 轻量自适应：一次性读取两张表的列信息，缺失/需放宽的字段汇总成 DDL 后在同一连接中执行
     try:
         inspector = inspect(ENGINE)
-        cols = [c.get("name") for c in inspector.get_columns("sync_logs")]
-        if "task_name" not in cols:
-            with ENGINE.begin() as conn:
-                conn.execute(sa_text("ALTER TABLE sync_logs ADD COLUMN task_name VARCHAR(64)"))
+        log_cols = {c.get("name") for c in inspector.get_columns("sync_logs")}
+        task_cols = {c.get("name") for c in inspector.get_columns("sync_tasks")}
     except Exception:
         # 避免因权限或版本问题影响主流程
-        pass
-    # 轻量自适应：若缺少 feishu_link 字段则自动补齐
-    try:
-        inspector = inspect(ENGINE)
-        cols = [c.get("name") for c in inspector.get_columns("sync_tasks")]
-        if "feishu_link" not in cols:
-            with ENGINE.begin() as conn:
-                conn.execute(sa_text("ALTER TABLE sync_tasks ADD COLUMN feishu_link TEXT"))
-        if "enabled" not in cols:
+        _DB_INITIALIZED = True
+        return
+    alters = []
+    if "task_name" not in log_cols:
+        alters.append("ALTER TABLE sync_logs ADD COLUMN task_name VARCHAR(64)")
+    if "feishu_link" not in task_cols:
+        alters.append("ALTER TABLE sync_tasks ADD COLUMN feishu_link TEXT")
+    if "enabled" not in task_cols:
+        alters.append("ALTER TABLE sync_tasks ADD COLUMN enabled TINYINT(1) NOT NULL DEFAULT 1")
+    # 兼容旧库：若存在已废弃的 app_token/table_id 且为 NOT NULL，则放宽为可空，避免插入报错
+    if "app_token" in task_cols:
+        alters.append("ALTER TABLE sync_tasks MODIFY COLUMN app_token VARCHAR(64) NULL DEFAULT NULL")
+    if "table_id" in task_cols:
+        alters.append("ALTER TABLE sync_tasks MODIFY COLUMN table_id VARCHAR(64) NULL DEFAULT NULL")
+    if alters:
+        try:
             with ENGINE.begin() as conn:
-                conn.execute(sa_text("ALTER TABLE sync_tasks ADD COLUMN enabled TINYINT(1) NOT NULL DEFAULT 1"))
-        # 兼容旧库：若存在已废弃的 app_token/table_id 且为 NOT NULL，则放宽为可空，避免插入报错
-        if "app_token" in cols:
-            try:
-                with ENGINE.begin() as conn:
-                    conn.execute(sa_text("ALTER TABLE sync_tasks MODIFY COLUMN app_token VARCHAR(64) NULL DEFAULT NULL"))
-            except Exception:
-                pass
-        if "table_id" in cols:
-            try:
-                with ENGINE.begin() as conn:
-                    conn.execute(sa_text("ALTER TABLE sync_tasks MODIFY COLUMN table_id VARCHAR(64) NULL DEFAULT NULL"))
-            except Exception:
-                pass
-    except Exception:
-        pass
-
-
+                for stmt in alters:
+                    try:
+                        conn.execute(sa_text(stmt))
+                    except Exception:
+                        # 单条 DDL 失败不影响其余字段补齐
+                        pass
+        except Exception:
+            pass
+    _DB_INITIALIZED = True
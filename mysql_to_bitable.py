@@ -2,23 +2,93 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import functools
+import itertools
+import json
 import os
 import sys
 import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
 from pathlib import Path
+from typing import Iterator, List, Tuple, Union
 
 import pandas as pd
-from sqlalchemy import create_engine, text
+import pymysql
+from pymysql.constants import FIELD_TYPE
+import requests
+import xlsxwriter
+from requests.adapters import HTTPAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
 import re
 try:
     import yaml
+    # 优先使用 libyaml 的 C 实现，未编译 libyaml 时回退到纯 Python 版本
+    try:
+        from yaml import CSafeLoader as _SafeLoader, CSafeDumper as _SafeDumper
+    except ImportError:
+        from yaml import SafeLoader as _SafeLoader, SafeDumper as _SafeDumper
 except Exception:
     yaml = None
+    _SafeLoader = _SafeDumper = None
+try:
+    import connectorx as cx
+except Exception:
+    cx = None
+try:
+    from zoneinfo import ZoneInfo
+    TZ_CN = ZoneInfo("Asia/Shanghai")
+except Exception:
+    TZ_CN = None
+try:
+    import orjson
+except Exception:
+    orjson = None
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pq = None
 
 
 def build_mysql_uri(host: str, port: int, username: str, password: str, database: str) -> str:
     return f"mysql+pymysql://{username}:{password}@{host}:{port}/{database}?charset=utf8mb4"
 
+
+def _get_engine(uri: Union[str, Engine]) -> Engine:
+    """按 URI 复用 Engine（及其连接池），避免定时任务每次运行都重新建连；传入 Engine 时直接使用。"""
+    if isinstance(uri, Engine):
+        return uri
+    return _engine_for_uri(uri)
+
+
+@functools.lru_cache(maxsize=4)
+def _engine_for_uri(uri: str) -> Engine:
+    return create_engine(uri, pool_size=10, max_overflow=20, pool_timeout=30, pool_recycle=1800, pool_pre_ping=True)
+
+
+# 一次扫描同时匹配字符串字面量与注释：字面量原样保留（其中的注释符号不生效），注释删除
+_SQL_CLEANER = re.compile(
+    r"""('(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*"|--[^\n]*|\#[^\n]*|/\*.*?\*/)""",
+    re.DOTALL,
+)
+
+_RE_LINE_CONT = re.compile(r"\\\s*\n")
+_RE_WS = re.compile(r"\s+")
+
+
+def _keep_string_literal(m: re.Match) -> str:
+    token = m.group(0)
+    return token if token[0] in "'\"" else ""
+
+
 def _normalize_sql(sql_text: str) -> str:
     """
     规范化 SQL：
@@ -29,117 +99,284 @@ def _normalize_sql(sql_text: str) -> str:
     - 去掉末尾分号
     - 将 Python 字符串转义的 %% 转换为单个 %（用于 date_format 等函数）
     """
-    def strip_sql_comments(sql: str) -> str:
-        """
-        删除 SQL 注释。支持：
-        - 单行注释：-- ... 与 # ...
-        - 块注释：/* ... */
-        保留字符串字面量内的注释符号。
-        """
-        result_chars = []
-        i = 0
-        n = len(sql)
-        in_single = False
-        in_double = False
-        in_block_comment = False
-        while i < n:
-            ch = sql[i]
-            nxt = sql[i + 1] if i + 1 < n else ""
-            # 处理块注释结束
-            if in_block_comment:
-                if ch == "*" and nxt == "/":
-                    in_block_comment = False
-                    i += 2
-                    continue
-                i += 1
-                continue
-            # 处理字符串进入/退出
-            if not in_single and not in_double:
-                # 块注释开始
-                if ch == "/" and nxt == "*":
-                    in_block_comment = True
-                    i += 2
-                    continue
-                # 单行注释 -- 和 #
-                if ch == "-" and nxt == "-":
-                    # 跳过到行尾
-                    while i < n and sql[i] != "\n":
-                        i += 1
-                    continue
-                if ch == "#":
-                    while i < n and sql[i] != "\n":
-                        i += 1
-                    continue
-                # 字符串开始
-                if ch == "'":
-                    in_single = True
-                    result_chars.append(ch)
-                    i += 1
-                    continue
-                if ch == "\"":
-                    in_double = True
-                    result_chars.append(ch)
-                    i += 1
-                    continue
-                # 常规字符
-                result_chars.append(ch)
-                i += 1
-                continue
-            else:
-                # 字符串内，处理转义与结束
-                result_chars.append(ch)
-                if in_single:
-                    if ch == "\\" and (i + 1) < n:
-                        # 逃逸下一个字符
-                        result_chars.append(sql[i + 1])
-                        i += 2
-                        continue
-                    if ch == "'":
-                        in_single = False
-                        i += 1
-                        continue
-                elif in_double:
-                    if ch == "\\" and (i + 1) < n:
-                        result_chars.append(sql[i + 1])
-                        i += 2
-                        continue
-                    if ch == "\"":
-                        in_double = False
-                        i += 1
-                        continue
-                i += 1
-        return "".join(result_chars)
-
     # 1) 统一换行风格并去掉回车
     s = sql_text.replace("\r", "")
     # 2) 先去除注释（保留换行，便于正确识别单行注释）
-    s = strip_sql_comments(s)
+    s = _SQL_CLEANER.sub(_keep_string_literal, s)
     # 3) 去掉行续接的反斜杠
-    s = re.sub(r"\\\s*\n", " ", s)
+    s = _RE_LINE_CONT.sub(" ", s)
     # 4) 将 %% 转换为 %
     s = s.replace("%%", "%")
     # 5) 合并多余空白
-    s = re.sub(r"\s+", " ", s).strip()
+    s = _RE_WS.sub(" ", s).strip()
     # 6) 去掉末尾分号
     if s.endswith(";"):
         s = s[:-1].strip()
     return s
 
 
-def read_mysql_to_df(uri: str, database: str, table: str = None, sql: str = None) -> pd.DataFrame:
-    engine = create_engine(uri)
+def _connectorx_uri(uri: str) -> str:
+    """SQLAlchemy URI（mysql+pymysql://...）转换为 connectorx 可识别的 mysql://...（去掉驱动名与查询参数）。"""
+    return make_url(uri).set(drivername="mysql", query={}).render_as_string(hide_password=False)
+
+
+def _stream_rows(engine, query: str, batch_size: int = 10_000):
+    """
+    以服务端游标（SSCursor）流式读取，返回 (列名列表, 行迭代器)。
+    行迭代器耗尽或关闭时释放游标与连接。
+    """
+    description, rows = _open_stream(engine, query, batch_size)
+    return [c[0] for c in description], rows
+
+
+def _open_stream(engine, query: str, batch_size: int):
+    """同 _stream_rows，但返回完整的 cursor.description（含各列的 MySQL 类型码）。"""
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor(pymysql.cursors.SSCursor)
+        cursor.execute(query)
+        description = cursor.description
+    except Exception:
+        conn.close()
+        raise
+
+    def _iter_rows():
+        try:
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            try:
+                cursor.close()
+            finally:
+                conn.close()
+
+    return description, _iter_rows()
+
+
+def _iter_frames(description, rows: Iterator[tuple], chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    将行迭代器按 chunksize 切分为 DataFrame；至少产出一个（可能为空的）分块，以便消费方拿到列名。
+    各列的 MySQL 类型码按列顺序记录在 df.attrs["mysql_type_codes"]，供分块写 Parquet 时确定全空列的类型。
+    """
+    cols = [c[0] for c in description]
+    type_codes = [c[1] for c in description]
+    while True:
+        batch = list(itertools.islice(rows, chunksize))
+        df = pd.DataFrame.from_records(batch, columns=cols, coerce_float=True)
+        df.attrs["mysql_type_codes"] = type_codes
+        yield df
+        if len(batch) < chunksize:
+            break
+
+
+def _iter_arrow_frames(reader) -> Iterator[pd.DataFrame]:
+    """
+    将 connectorx 返回的 Arrow 记录批逐批转为 DataFrame；至少产出一个（可能为空的）分块。
+    DECIMAL 列先转为 float64，与 DBAPI 路径的 coerce_float 行为一致；
+    各列 Arrow 类型按列顺序记录在 df.attrs["arrow_types"]，供分块写 Parquet 时确定全空列的类型。
+    """
+    schema = pa.schema([
+        field.with_type(pa.float64()) if pa.types.is_decimal(field.type) else field for field in reader.schema
+    ])
+    arrow_types = list(schema.types)
+    emitted = False
+    for batch in reader:
+        table = pa.Table.from_batches([batch]).cast(schema)
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        df.attrs["arrow_types"] = arrow_types
+        emitted = True
+        yield df
+    if not emitted:
+        df = schema.empty_table().to_pandas()
+        df.attrs["arrow_types"] = arrow_types
+        yield df
+
+
+def read_mysql_to_df(uri: Union[str, Engine], database: str, table: str = None, sql: str = None,
+                     stream: bool = False, chunksize: int = 50_000
+                     ) -> Union[Iterator[pd.DataFrame], Tuple[List[str], Iterator[tuple]]]:
+    """
+    执行任务 SQL（或整表查询）。
+    stream=True 时不构建 DataFrame，返回 (列名列表, 行迭代器)，行元组原样流向 write_temp_excel 等消费方，
+    内存占用与结果集大小无关。
+    否则分块读取（connectorx Arrow 记录批，或服务端游标），返回每块至多 chunksize 行的 DataFrame 迭代器；
+    不提供一次性读入整个结果集的模式。
+    uri 也可以直接传入已有的 Engine，复用其连接池。
+    """
+    engine = _get_engine(uri)
     if sql and sql.strip():
         query = _normalize_sql(sql)
     else:
         # 保守引用库与表名
         query = f"SELECT * FROM `{database}`.`{table}`"
-    with engine.connect() as conn:
-        return pd.read_sql(text(query), conn)
+    if stream:
+        return _stream_rows(engine, query)
+    if not chunksize or chunksize <= 0:
+        raise ValueError("chunksize 须为正整数")
+    # 已安装 connectorx（及 pyarrow）时由其原生驱动以 Arrow 记录批流式读取；
+    # 遇到其不支持的列类型等情况则回退到服务端游标路径
+    if cx is not None and pa is not None:
+        try:
+            reader = cx.read_sql(
+                _connectorx_uri(engine.url.render_as_string(hide_password=False)),
+                query,
+                return_type="arrow_stream",
+                batch_size=chunksize,
+            )
+            return _iter_arrow_frames(reader)
+        except Exception as e:
+            print(f"⚠️ connectorx 读取失败，回退到 DBAPI: {e}")
+    description, rows = _open_stream(engine, query, batch_size=chunksize)
+    return _iter_frames(description, rows, chunksize)
+
+
+# xlsxwriter 常量内存模式：逐行落盘，不在内存中保留整张工作表
+# Excel 单个工作表最多 1,048,576 行，首行为表头
+EXCEL_MAX_DATA_ROWS = 1_048_575
 
+XLSX_OPTIONS = {
+    'constant_memory': True,
+    'strings_to_urls': False,
+    'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+}
 
-def write_temp_excel(df: pd.DataFrame, excel_path: Path) -> None:
+
+def _frame_rows(df: pd.DataFrame) -> Iterator[tuple]:
+    # 缺失值（NaN/NaT）统一转为 None，写为空单元格
+    frame = df.astype(object).where(df.notna(), None)
+    return frame.itertuples(index=False, name=None)
+
+
+def _write_bytes_cell(worksheet, row: int, col: int, value: bytes, cell_format=None):
+    # BLOB/BINARY/BIT 列由 PyMySQL 返回 bytes，xlsxwriter 无法直接写入，按 UTF-8 解码为文本
+    return worksheet.write_string(row, col, value.decode('utf-8', errors='replace'), cell_format)
+
+
+def write_temp_excel(data, excel_path: Path) -> int:
+    """
+    逐行流式写入 Excel（xlsxwriter constant_memory），返回写入的数据行数。
+    data 可以是：DataFrame；DataFrame 分块迭代器（read_mysql_to_df(chunksize=...)）；
+    或 read_mysql_to_df(stream=True) 返回的 (列名列表, 行迭代器)。
+    不走 df.to_excel：pandas 按列写单元格，与 constant_memory 的逐行落盘不兼容。
+    """
+    if isinstance(data, tuple):
+        cols, rows = data
+    else:
+        frames = iter([data] if isinstance(data, pd.DataFrame) else data)
+        first = next(frames)
+        cols = list(first.columns)
+        rows = (row for frame in itertools.chain([first], frames) for row in _frame_rows(frame))
     excel_path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_excel(excel_path, index=False, engine='openpyxl')
+    wb = xlsxwriter.Workbook(str(excel_path), XLSX_OPTIONS)
+    try:
+        ws = wb.add_worksheet()
+        ws.add_write_handler(bytes, _write_bytes_cell)
+        ws.write_row(0, 0, cols)
+        count = 0
+        for count, row in enumerate(rows, start=1):
+            # 超出工作表行数上限时 xlsxwriter 会静默丢弃该行，须直接失败而非上报截断后的结果
+            if count > EXCEL_MAX_DATA_ROWS:
+                raise ValueError(f"结果集超过 Excel 单表上限 {EXCEL_MAX_DATA_ROWS} 行，无法写入 {excel_path.name}")
+            if ws.write_row(count, 0, row):
+                # write_row 遇到单元格告警（如字符串超过 32767 字符被截断）即中止该行，逐格补写其余单元格
+                for col, value in enumerate(row):
+                    ws.write(count, col, value)
+    finally:
+        wb.close()
+    return count
+
+
+# MySQL 类型码 -> 该列经 DataFrame 分块后对应的 Arrow 类型（用于首块全空、无法推断类型的列）：
+# 整数含 NULL 时 pandas 会转为 float64，写入 int64 时 NaN 即转为 null；DECIMAL 经 coerce_float 为 float；
+# DATETIME/TIMESTAMP 已格式化为字符串；其余（字符串、JSON 等）按 string 处理
+_MYSQL_INT_TYPES = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.LONGLONG, FIELD_TYPE.INT24,
+                    FIELD_TYPE.YEAR}
+_MYSQL_FLOAT_TYPES = {FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE, FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL}
+_MYSQL_DATE_TYPES = {FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE}
+
+
+def _arrow_type_for_mysql(type_code):
+    if type_code in _MYSQL_INT_TYPES:
+        return pa.int64()
+    if type_code in _MYSQL_FLOAT_TYPES:
+        return pa.float64()
+    if type_code in _MYSQL_DATE_TYPES:
+        return pa.date32()
+    if type_code == FIELD_TYPE.TIME:
+        return pa.duration("ns")
+    return pa.string()
+
+
+def _arrow_type_for_source(arrow_type):
+    """connectorx 读出的 Arrow 类型 -> 该列经 DataFrame 分块后对应的 Arrow 类型（规则同上）。"""
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_null(arrow_type):
+        return pa.string()
+    if pa.types.is_integer(arrow_type):
+        return pa.int64()
+    return arrow_type
+
+
+def _resolve_parquet_schema(df: pd.DataFrame, type_codes=None, arrow_types=None):
+    """
+    以首个分块推断的 schema 为准写入后续分块。首块中全空的列会被推断为 null 类型，
+    后续分块出现值时无法写入，因此按读库时的源列类型（MySQL 类型码或 connectorx 的 Arrow 类型）
+    确定其真实类型，无类型信息时按 string。
+    """
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    fields = []
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            if type_codes:
+                field = field.with_type(_arrow_type_for_mysql(type_codes[i]))
+            elif arrow_types:
+                field = field.with_type(_arrow_type_for_source(arrow_types[i]))
+            else:
+                field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+def write_temp_parquet(frames, parquet_path: Path) -> int:
+    """
+    将 DataFrame（或分块迭代器）写入 Parquet（pyarrow，zstd 压缩），返回写入的数据行数。
+    读写均为列式二进制，远快于 xlsx 的 XML + zlib 序列化；需安装 pyarrow。
+    """
+    if pa is None:
+        raise RuntimeError("未安装 pyarrow，无法写入 Parquet")
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    parquet_path.parent.mkdir(parents=True, exist_ok=True)
+    writer = None
+    schema = None
+    count = 0
+    try:
+        for df in frames:
+            # 类型提示仅用于确定 schema，取出后不随 DataFrame.attrs 写入 Parquet 元数据
+            type_codes = df.attrs.pop("mysql_type_codes", None)
+            arrow_types = df.attrs.pop("arrow_types", None)
+            if writer is None:
+                schema = _resolve_parquet_schema(df, type_codes, arrow_types)
+                writer = pq.ParquetWriter(str(parquet_path), schema, compression="zstd")
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+            count += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def _xtf_main_path() -> Path:
+    # 使用相对于当前脚本的路径定位 XTF.py
+    # 当前文件在项目根目录，XTF.py 在 XTF-main/XTF.py
+    return Path(__file__).resolve().parent / "XTF-main" / "XTF.py"
+
+
+def parquet_writer_available() -> bool:
+    """是否可写出 Parquet 中间文件（需安装 pyarrow）。XTF 能否读取由部署方通过配置声明。"""
+    return pa is not None
 
 
 def load_yaml_config(config_path: Path) -> dict:
@@ -147,7 +384,7 @@ def load_yaml_config(config_path: Path) -> dict:
         raise RuntimeError("缺少 pyyaml，请先: pip install pyyaml")
     if not config_path.exists():
         raise FileNotFoundError(f"未找到配置文件: {config_path}")
-    data = yaml.safe_load(config_path.read_text(encoding='utf-8')) or {}
+    data = yaml.load(config_path.read_text(encoding='utf-8'), Loader=_SafeLoader) or {}
     return data
 
 
@@ -159,52 +396,250 @@ def build_clean_config_text(cfg: dict, excel_path: Path) -> str:
     cleaned['file_path'] = str(excel_path)
     if 'source' in cleaned:
         cleaned.pop('source', None)
-    return yaml.safe_dump(cleaned, allow_unicode=True, sort_keys=False)
+    return yaml.dump(cleaned, Dumper=_SafeDumper, allow_unicode=True, sort_keys=False)
+
+
+# XTF 输出仅保留的尾部行数（用于失败摘要）
+XTF_OUTPUT_TAIL_LINES = 200
+# 检测到致命错误后，等待 XTF 自行退出的宽限秒数，超时即结束子进程
+XTF_FAIL_GRACE_SECONDS = 5
+# XTF 输出关键字（不区分大小写）：
+# - success：成功信号，包含“同步完成”或“批量创建完成”
+# - hard_fail：致命错误，出现即失败
+# - error：“- ERROR -”日志行，仅在未命中白名单时判定失败
+# - whitelist：可忽略错误（删除不存在记录导致的失败不视为整体失败）
+# - permission：权限类错误（错误码 91403/1254302 或 forbidden/no permissions 字样），用于失败摘要
+XTF_OUTPUT_CUES = {
+    "success": ["🎉 批量创建完成", "批量创建完成", "同步完成"],
+    "hard_fail": ["同步出错", "程序异常", "traceback", "获取访问令牌失败", "app secret invalid"],
+    "error": [" - error - "],
+    "whitelist": ["record not found", "错误码 1254043", "1254043"],
+    "permission": ["91403", "1254302", "forbidden", "no permissions"],
+}
+# 所有关键字编译为一个带命名分组的交替式，每行只扫描一遍，由 lastgroup 得到命中的类别
+_XTF_CUES = re.compile(
+    "|".join(
+        f"(?P<{tag}>{'|'.join(re.escape(cue) for cue in cues)})" for tag, cues in XTF_OUTPUT_CUES.items()
+    ),
+    re.IGNORECASE,
+)
 
 
 def run_xtf_with_config(config_path: Path):
-    # 使用相对于当前脚本的路径定位 XTF.py
-    # 当前文件在项目根目录，XTF.py 在 XTF-main/XTF.py
-    current_file = Path(__file__).resolve()
-    project_root = current_file.parent
-    xtf_main = project_root / "XTF-main" / "XTF.py"
+    """
+    运行 XTF，返回 (返回码, 是否成功, 尾部输出, 是否出现权限类错误)。
+    尾部输出只保留最后 XTF_OUTPUT_TAIL_LINES 行，因此权限错误在读取过程中判定，不依赖尾部文本。
+    """
+    xtf_main = _xtf_main_path()
     if not xtf_main.exists():
         print(f"❌ 未找到 XTF 主程序: {xtf_main}")
-        return 1, False, "XTF.py not found"
+        return 1, False, "XTF.py not found", False
     # 固定为 bitable
     cmd = [sys.executable, str(xtf_main), "--target-type", "bitable", "--config", str(config_path)]
     print("运行命令:")
     print(" ", " ".join(cmd))
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    stdout = proc.stdout or ""
-    stderr = proc.stderr or ""
-    output = stdout + ("\n" + stderr if stderr else "")
-    # 成功信号：包含“同步完成”或“批量创建完成”
-    success_cues = ["同步完成", "🎉 批量创建完成", "批量创建完成"]
-    ok = any(cue in output for cue in success_cues)
-    # 失败判定（白名单放行“record not found/1254043”等可忽略错误）
-    lower_output = output.lower()
-    hard_fail_indicators = [
-        "同步出错",
-        "程序异常",
-        "traceback",
-        "获取访问令牌失败",
-        "app secret invalid",
-        " - error - ",
-    ]
-    # 可忽略错误白名单（删除不存在记录导致的失败不视为整体失败）
-    whitelist_markers = [
-        "record not found",
-        "错误码 1254043",
-        "1254043",
-    ]
+    # 逐行消费合并后的 stdout/stderr：只保留尾部若干行用于失败摘要，关键字在读取过程中即时判定
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+        bufsize=1,
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},
+    )
+    tail = deque(maxlen=XTF_OUTPUT_TAIL_LINES)
+    ok = False
+    hard_fail = False
+    has_error_line = False
+    whitelisted = False
+    permission_denied = False
+    kill_timer = None
+    try:
+        for line in proc.stdout:
+            tail.append(line.rstrip("\n"))
+            tags = {m.lastgroup for m in _XTF_CUES.finditer(line)}
+            if not tags:
+                continue
+            if "success" in tags:
+                ok = True
+            if "error" in tags:
+                has_error_line = True
+            if "whitelist" in tags:
+                whitelisted = True
+            if "permission" in tags:
+                permission_denied = True
+            if not hard_fail and "hard_fail" in tags:
+                # 出现致命错误后不再等待同步跑完：留出宽限期收集错误详情（如 Traceback 正文），随后结束子进程
+                hard_fail = True
+                kill_timer = threading.Timer(XTF_FAIL_GRACE_SECONDS, proc.kill)
+                kill_timer.start()
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+        if kill_timer is not None:
+            kill_timer.cancel()
     # 若出现除“- ERROR -”之外的致命错误关键字，则失败
-    if any(ind in lower_output for ind in ["同步出错", "程序异常", "traceback", "获取访问令牌失败", "app secret invalid"]):
+    if hard_fail:
         ok = False
     # 仅当包含 “- ERROR -” 且不属于白名单语境时，判定失败
-    elif " - error - " in lower_output and not any(w in lower_output for w in whitelist_markers):
+    elif has_error_line and not whitelisted:
         ok = False
-    return proc.returncode, ok, output
+    return returncode, ok, "\n".join(tail), permission_denied
+
+
+FEISHU_OPEN_API = "https://open.feishu.cn/open-apis"
+# batch_create 单次最多 500 条
+BITABLE_BATCH_SIZE = 500
+
+
+def _new_feishu_session() -> requests.Session:
+    # 连接池保持与 open.feishu.cn 的 keep-alive 连接，各批次复用同一 TLS 连接
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return session
+
+
+def _dumps_json(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+# 频控：HTTP 429 或错误码 99991400；令牌失效：99991661/99991663/99991668（刷新令牌后重试）
+FEISHU_RATE_LIMIT_CODES = {99991400}
+FEISHU_TOKEN_INVALID_CODES = {99991661, 99991663, 99991668}
+# tenant_access_token 有效期约 2 小时，提前 5 分钟刷新
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+# 重试退避的最长等待秒数
+FEISHU_MAX_BACKOFF_SECONDS = 60
+
+
+def _request_tenant_access_token(session: requests.Session, app_id: str, app_secret: str) -> Tuple[str, int]:
+    """获取 tenant_access_token，返回 (令牌, 剩余有效秒数)。"""
+    resp = session.post(
+        f"{FEISHU_OPEN_API}/auth/v3/tenant_access_token/internal",
+        json={"app_id": app_id, "app_secret": app_secret},
+        timeout=10,
+    )
+    data = resp.json()
+    if data.get("code") != 0:
+        raise RuntimeError(f"获取访问令牌失败: code={data.get('code')}, msg={data.get('msg')}")
+    return data["tenant_access_token"], int(data.get("expire") or 7200)
+
+
+def fetch_tenant_access_token(session: requests.Session, app_id: str, app_secret: str) -> str:
+    return _request_tenant_access_token(session, app_id, app_secret)[0]
+
+
+def _to_epoch_ms(value) -> int:
+    # 多维表日期字段取毫秒时间戳；MySQL 的 DATE/DATETIME 不带时区，按北京时间解释
+    if isinstance(value, datetime):
+        dt = value if value.tzinfo is not None else value.replace(tzinfo=TZ_CN)
+    else:
+        dt = datetime(value.year, value.month, value.day, tzinfo=TZ_CN)
+    return int(dt.timestamp() * 1000)
+
+
+def _to_bitable_value(value):
+    """将 MySQL 行值转换为可 JSON 序列化的多维表字段值。"""
+    if isinstance(value, (datetime, date)):
+        return _to_epoch_ms(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _retry_after_seconds(resp: requests.Response):
+    # 飞书频控响应通过 x-ogw-ratelimit-reset 给出距重置的秒数，兼容标准 Retry-After
+    for header in ("x-ogw-ratelimit-reset", "Retry-After"):
+        try:
+            return float(resp.headers[header])
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+def push_rows_to_bitable(cols: list, rows, app_id: str, app_secret: str, app_token: str, table_id: str,
+                         batch_size: int = BITABLE_BATCH_SIZE, rate_limit_delay: float = 0.0,
+                         max_retries: int = 3) -> int:
+    """
+    直连写入：消费行迭代器，按批调用多维表 records/batch_create 追加记录，返回写入行数。
+    仅追加，不做索引列去重、字段自动创建与类型推断（这些由 XTF 引擎负责）。
+    频控、服务端错误与网络异常按指数退避重试至多 max_retries 次；令牌临近过期或失效时自动刷新。
+    每批带固定的 client_token，重试不会重复写入同一批；中途失败时异常信息给出已写入的行数。
+    """
+    session = _new_feishu_session()
+    url = f"{FEISHU_OPEN_API}/bitable/v1/apps/{app_token}/tables/{table_id}/records/batch_create"
+    backoff = max(rate_limit_delay, 1.0)
+    token = None
+    token_deadline = 0.0
+
+    def _headers(refresh: bool = False) -> dict:
+        nonlocal token, token_deadline
+        if refresh or token is None or time.monotonic() >= token_deadline:
+            token, expire = _request_tenant_access_token(session, app_id, app_secret)
+            token_deadline = time.monotonic() + max(expire - TOKEN_REFRESH_MARGIN_SECONDS, 60)
+        return {"Authorization": f"Bearer {token}", "Content-Type": "application/json; charset=utf-8"}
+
+    def _flush(records: list) -> None:
+        # 请求体自行序列化（优先 orjson），不经 requests 内置的 json.dumps
+        body = _dumps_json({"records": records})
+        params = {"client_token": str(uuid.uuid4())}
+        refresh = False
+        error = ""
+        for attempt in range(max_retries + 1):
+            wait = None
+            headers = _headers(refresh)
+            refresh = False
+            try:
+                resp = session.post(url, headers=headers, params=params, data=body, timeout=30)
+            except requests.RequestException as e:
+                error = f"请求异常: {e}"
+            else:
+                try:
+                    data = resp.json()
+                except ValueError:
+                    data = {}
+                code = data.get("code")
+                if resp.status_code == 200 and code == 0:
+                    return
+                error = f"http={resp.status_code}, code={code}, msg={data.get('msg')}"
+                if code in FEISHU_TOKEN_INVALID_CODES:
+                    refresh = True
+                    wait = 0
+                elif resp.status_code == 429 or code in FEISHU_RATE_LIMIT_CODES or resp.status_code >= 500:
+                    wait = _retry_after_seconds(resp)
+                else:
+                    raise RuntimeError(f"批量创建失败: {error}")
+            if attempt < max_retries:
+                if wait is None:
+                    wait = min(backoff * 2 ** attempt, FEISHU_MAX_BACKOFF_SECONDS)
+                time.sleep(wait)
+        raise RuntimeError(f"批量创建失败（已重试 {max_retries} 次）: {error}")
+
+    count = 0
+    batch = []
+    try:
+        for row in rows:
+            fields = {col: _to_bitable_value(v) for col, v in zip(cols, row) if v is not None}
+            batch.append({"fields": fields})
+            if len(batch) >= batch_size:
+                _flush(batch)
+                count += len(batch)
+                batch = []
+                if rate_limit_delay:
+                    time.sleep(rate_limit_delay)
+        if batch:
+            _flush(batch)
+            count += len(batch)
+    except Exception as e:
+        raise RuntimeError(f"{e}（此前已追加 {count} 行，重新运行会重复追加这些行）") from e
+    return count
 
 
 def parse_args():
@@ -242,34 +677,58 @@ def main():
         print(f"❌ 配置缺失: {missing}")
         sys.exit(1)
 
-    # 3) 读取 MySQL
-    print("📥 正在从 MySQL 读取数据...")
     uri = build_mysql_uri(str(host), int(port), str(username), str(password), str(database))
-    df = read_mysql_to_df(uri, str(database), table=str(table) if table else None, sql=sql_text)
-    print(f"✅ 读取完成: {len(df)} 行 × {len(df.columns)} 列")
-    if df.empty:
-        print("⚠️ 查询结果为空，已退出")
+
+    # 2.1) 直连写入（direct_write: true）：MySQL 行直接批量追加到多维表，不生成 Excel、不启动 XTF
+    if cfg.get('direct_write'):
+        target = {k: cfg.get(k) for k in ('app_id', 'app_secret', 'app_token', 'table_id')}
+        missing = [k for k, v in target.items() if v in (None, '')]
+        if missing:
+            print(f"❌ 直连写入配置缺失: {missing}")
+            sys.exit(1)
+        print("📥 正在从 MySQL 读取数据并直连写入多维表...")
+        cols, rows = read_mysql_to_df(uri, str(database), table=str(table) if table else None, sql=sql_text, stream=True)
+        try:
+            row_count = push_rows_to_bitable(
+                cols, rows,
+                batch_size=min(int(cfg.get('batch_size') or BITABLE_BATCH_SIZE), BITABLE_BATCH_SIZE),
+                rate_limit_delay=float(cfg.get('rate_limit_delay') or 0),
+                max_retries=int(cfg.get('max_retries') if cfg.get('max_retries') is not None else 3),
+                **target,
+            )
+        except Exception as e:
+            print(f"\n❌ 同步流程失败: {e}")
+            sys.exit(1)
+        print(f"\n✅ 同步流程结束: 追加 {row_count} 行 × {len(cols)} 列")
         sys.exit(0)
 
-    # 4) 导出 Excel 到 YAML 指定路径（若未设置则使用默认路径）
+    # 3) 流式读取 MySQL 并导出 Excel 到 YAML 指定路径（若未设置则使用默认路径）
     file_path_cfg = cfg.get('file_path') or "_tmp_mysql_export.xlsx"
     excel_path = Path(file_path_cfg).expanduser().resolve()
+    print("📥 正在从 MySQL 读取数据...")
+    cols, rows = read_mysql_to_df(uri, str(database), table=str(table) if table else None, sql=sql_text, stream=True)
     print(f"📄 导出 Excel: {excel_path}")
-    write_temp_excel(df, excel_path)
+    row_count = write_temp_excel((cols, rows), excel_path)
+    print(f"✅ 读取完成: {row_count} 行 × {len(cols)} 列")
+    if row_count == 0:
+        print("⚠️ 查询结果为空，已退出")
+        sys.exit(0)
 
-    # 5) 临时覆盖原 YAML（去除 source，更新 file_path），执行完毕后恢复
-    original_text = cfg_path.read_text(encoding='utf-8')
+    # 4) 清洗后的配置（去除 source，更新 file_path）写入临时文件交给 XTF，原 YAML 不做任何改写；
+    #    临时文件与原配置同目录，保持相对路径语义，且并发运行互不干扰
     cleaned_text = build_clean_config_text(cfg, excel_path)
+    with tempfile.NamedTemporaryFile(
+        'w', encoding='utf-8', suffix='.yaml', prefix=f".{cfg_path.stem}.", dir=cfg_path.parent, delete=False
+    ) as tmp:
+        tmp.write(cleaned_text)
     try:
-        cfg_path.write_text(cleaned_text, encoding='utf-8')
-        # 6) 调用 XTF 引擎执行同步
+        # 5) 调用 XTF 引擎执行同步
         print("🚀 调用 XTF 引擎执行同步...")
-        rc, ok, output = run_xtf_with_config(cfg_path)
+        rc, ok, output, _ = run_xtf_with_config(Path(tmp.name))
     finally:
-        # 恢复原配置（包含 source 段）
         try:
-            cfg_path.write_text(original_text, encoding='utf-8')
-        except Exception:
+            os.unlink(tmp.name)
+        except OSError:
             pass
     if ok:
         print("\n✅ 同步流程结束 (返回码 0)")
@@ -1,56 +1,85 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import pathlib
-import os
+import atexit
+import functools
+import json
+import queue
+import threading
 import time
 import traceback
 from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, Tuple
 
 import requests
-import time
+from requests.adapters import HTTPAdapter
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from urllib3.util.retry import Retry
 import hmac
 import hashlib
 import base64
-import pandas as pd
 
 from config import CONFIG
-from models import SessionLocal, SyncTask, SyncLog, now_cn_naive
-from mysql_to_bitable import (
-    read_mysql_to_df,
-    write_temp_excel,
-    run_xtf_with_config,
-)
-import yaml
-try:
-    from zoneinfo import ZoneInfo
-except Exception:
-    ZoneInfo = None
+from models import ENGINE, TZ_CN, SessionLocal, SyncTask, SyncLog, now_cn_naive
+# pandas/numpy/yaml 及 mysql_to_bitable（xlsxwriter、pymysql 等）仅在实际执行任务时用到，
+# 在函数内按需导入：只负责调度/投递的进程（Web、Celery 投递端）无需加载，启动更快、常驻内存更小
+if TYPE_CHECKING:
+    import pandas as pd
 import re
-import fcntl
 
+# 任务读库的分块行数
+READ_CHUNK_ROWS = 50_000
+
+# Webhook 复用同一连接池，连续告警时免去每次的 TCP+TLS 握手；
+# 限流/服务端错误时对 POST 重试（重复告警好过丢失告警），重试耗尽后返回最后一次响应
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(
+            total=2,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
+        ),
+    ),
+)
+
+
+_RE_BASE = re.compile(r"/base/([A-Za-z0-9]+)")
+_RE_TABLE = re.compile(r"[?&]table=(tbl[0-9A-Za-z]+)")
 
 
+@functools.lru_cache(maxsize=256)
 def _parse_feishu_link(link: str) -> dict:
     """
     解析飞书多维表链接（仅支持 bitable）:
     - https://.../base/<app_token>?table=<tbl...>&view=...
     返回: { 'target_type': 'bitable', 'app_token':..., 'table_id':... }
+    结果按链接缓存并在调用方之间共享，调用方只读不改。
     """
     if not link:
         return {}
     link = link.strip()
     # bitable
-    m_base = re.search(r"/base/([A-Za-z0-9]+)", link)
+    m_base = _RE_BASE.search(link)
     if m_base:
         app_token = m_base.group(1)
-        m_table = re.search(r"[?&]table=(tbl[0-9A-Za-z]+)", link)
+        m_table = _RE_TABLE.search(link)
         table_id = m_table.group(1) if m_table else ""
         return {"target_type": "bitable", "app_token": app_token, "table_id": table_id}
     return {}
 
 
+# 签名密钥只需编码一次
+_SECRET_BYTES = (getattr(CONFIG, "webhook_secret", "") or "").encode("utf-8")
+
+
 def _send_webhook(message: str) -> tuple:
     """
     发送飞书Webhook消息。
@@ -64,30 +93,27 @@ def _send_webhook(message: str) -> tuple:
     }
     headers = {"Content-Type": "application/json; charset=utf-8"}
     # 若开启签名校验，计算签名（与飞书文档一致：HMAC 的 key=timestamp+'\n'+secret，消息体为空）
-    if getattr(CONFIG, "webhook_secret", ""):
-        ts_int = int(time.time())
+    if _SECRET_BYTES:
+        ts_int = time.time_ns() // 1_000_000_000
         timestamp = str(ts_int)
-        string_to_sign = f"{timestamp}\n{CONFIG.webhook_secret}"
-        sign = base64.b64encode(
-            hmac.new(string_to_sign.encode("utf-8"), b"", digestmod=hashlib.sha256).digest()
-        ).decode("utf-8")
+        string_to_sign = b"\n".join([timestamp.encode("ascii"), _SECRET_BYTES])
+        sign = base64.b64encode(hmac.new(string_to_sign, b"", digestmod=hashlib.sha256).digest()).decode("utf-8")
         # 按官方推荐：将 timestamp 与 sign 放入请求体
         payload.update({"timestamp": timestamp, "sign": sign})
         url = CONFIG.webhook_url
-        # 记录便于排查的时间信息（北京时区）
-        try:
-            if ZoneInfo:
-                cn_time = datetime.fromtimestamp(ts_int, ZoneInfo("Asia/Shanghai")).strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                cn_time = datetime.fromtimestamp(ts_int).strftime("%Y-%m-%d %H:%M:%S")
-        except Exception:
-            cn_time = "n/a"
-        debug_suffix = f" (ts={timestamp}, beijing_time={cn_time})"
+        # 记录便于排查的时间信息（北京时区），仅在开启 Webhook 调试时计算
+        debug_suffix = ""
+        if CONFIG.webhook_debug:
+            try:
+                cn_time = datetime.fromtimestamp(ts_int, TZ_CN).strftime("%Y-%m-%d %H:%M:%S")
+            except Exception:
+                cn_time = "n/a"
+            debug_suffix = f" (ts={timestamp}, beijing_time={cn_time})"
     else:
         url = CONFIG.webhook_url
         debug_suffix = ""
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=10)
+        resp = _SESSION.post(url, headers=headers, json=payload, timeout=(3, 10))
         txt = resp.text
         if resp.status_code != 200:
             return False, f"http {resp.status_code}: {txt[:200]}{debug_suffix}"
@@ -107,9 +133,71 @@ def _send_webhook(message: str) -> tuple:
         return False, f"exception: {e}{debug_suffix}"
 
 
-def _build_xtf_yaml_dict(task: SyncTask, excel_path: Path) -> Dict:
+# 失败告警队列：由后台守护线程逐条发送（复用 _SESSION 连接池），首次入队时启动线程
+_WEBHOOK_Q: "queue.Queue[Tuple[int, str]]" = queue.Queue(maxsize=1024)
+_WEBHOOK_WORKER = None
+_WEBHOOK_WORKER_LOCK = threading.Lock()
+# 进程退出时等待积压告警发送的最长秒数
+WEBHOOK_FLUSH_TIMEOUT = 15
+
+
+def _append_webhook_failure(log_id: int, info: str) -> None:
+    """将 Webhook 失败信息追加到对应日志（后台线程使用独立的线程级 Session）。"""
+    session = SessionLocal()
+    try:
+        log = session.get(SyncLog, log_id)
+        if log is not None:
+            log.message = (log.message or "") + f" | Webhook推送失败: {info}"
+            session.commit()
+    finally:
+        SessionLocal.remove()
+
+
+def _webhook_worker() -> None:
+    while True:
+        log_id, message = _WEBHOOK_Q.get()
+        try:
+            ok, info = _send_webhook(message)
+            if not ok:
+                _append_webhook_failure(log_id, info)
+        except Exception as e:
+            print(f"⚠️ Webhook 后台发送异常: {e}")
+        finally:
+            _WEBHOOK_Q.task_done()
+
+
+def _flush_webhooks(timeout: float = WEBHOOK_FLUSH_TIMEOUT) -> None:
+    """进程退出时等待队列中的告警发送完毕（最多 timeout 秒），避免告警随守护线程一起丢失。"""
+    deadline = time.monotonic() + timeout
+    with _WEBHOOK_Q.all_tasks_done:
+        while _WEBHOOK_Q.unfinished_tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"⚠️ 退出时仍有 {_WEBHOOK_Q.unfinished_tasks} 条告警未发送")
+                break
+            _WEBHOOK_Q.all_tasks_done.wait(remaining)
+
+
+atexit.register(_flush_webhooks)
+
+
+def _enqueue_webhook(log_id: int, message: str) -> bool:
+    """告警入队，立即返回；队列已满时返回 False，由调用方同步发送。"""
+    global _WEBHOOK_WORKER
+    with _WEBHOOK_WORKER_LOCK:
+        if _WEBHOOK_WORKER is None or not _WEBHOOK_WORKER.is_alive():
+            _WEBHOOK_WORKER = threading.Thread(target=_webhook_worker, name="webhook-sender", daemon=True)
+            _WEBHOOK_WORKER.start()
+    try:
+        _WEBHOOK_Q.put_nowait((log_id, message))
+        return True
+    except queue.Full:
+        return False
+
+
+def _build_xtf_yaml_dict(task: SyncTask, data_path: Path, *, parsed: dict = None) -> Dict:
     cfg = {
-        "file_path": str(excel_path),
+        "file_path": str(data_path),
         "app_id": CONFIG.feishu.app_id,
         "app_secret": CONFIG.feishu.app_secret,
         "sync_mode": task.sync_mode,
@@ -121,8 +209,9 @@ def _build_xtf_yaml_dict(task: SyncTask, excel_path: Path) -> Dict:
         "field_type_strategy": task.field_type_strategy,
         "create_missing_fields": bool(task.create_missing_fields),
     }
-    # 解析链接（仅支持 bitable）
-    parsed = _parse_feishu_link(task.feishu_link or "")
+    # 解析链接（仅支持 bitable）；调用方已解析时直接复用
+    if parsed is None:
+        parsed = _parse_feishu_link(task.feishu_link or "")
     if parsed.get("target_type") == "bitable":
         cfg.update({
             "target_type": "bitable",
@@ -143,8 +232,9 @@ def _build_xtf_yaml_dict(task: SyncTask, excel_path: Path) -> Dict:
     return cfg
 
 
-def _display_target_from_link(link: str) -> str:
-    parsed = _parse_feishu_link(link or "")
+def _display_target_from_link(link: str, *, parsed: dict = None) -> str:
+    if parsed is None:
+        parsed = _parse_feishu_link(link or "")
     if parsed.get("target_type") == "bitable":
         at = parsed.get("app_token", "")
         tid = parsed.get("table_id", "")
@@ -156,84 +246,168 @@ def _display_target_from_link(link: str) -> str:
     return link or "unknown"
 
 
-def run_task(task_id: int) -> None:
+def _format_datetime_column(col: "pd.Series") -> "pd.Series":
+    """
+    将 datetime64 列向量化格式化为 'YYYY-MM-DD HH:MM:SS' 字符串（等价于 dt.strftime，但不逐个单元格调用 Python）。
+    带时区的列先换算到北京时间；NaT 输出为 None。
+    """
+    import numpy as np
+    import pandas as pd
+
+    if col.dt.tz is not None:
+        col = col.dt.tz_convert("Asia/Shanghai").dt.tz_localize(None)
+    formatted = np.datetime_as_string(col.to_numpy(dtype="datetime64[s]"), unit="s")
+    out = pd.Series(np.char.replace(formatted, "T", " "), index=col.index, dtype=object)
+    out[col.isna().to_numpy()] = None
+    return out
+
+
+def _fix_datetime_columns(df: "pd.DataFrame") -> "pd.DataFrame":
+    """时区修复：将所有时间列转换为字符串格式，防止 Excel/飞书 转换时出现时区偏差"""
+    for col in df.select_dtypes(include=["datetime", "datetimetz"]).columns:
+        df[col] = _format_datetime_column(df[col])
+    return df
+
+
+@functools.lru_cache(maxsize=1)
+def _xtf_input_format() -> str:
+    """解析交给 XTF 的中间文件格式；配置了 parquet 但条件不满足时告警（每进程一次）并回退 xlsx。"""
+    if CONFIG.xtf_input_format != "parquet":
+        return "xlsx"
+    from mysql_to_bitable import parquet_writer_available
+
+    if not CONFIG.xtf_supports_parquet:
+        reason = "未声明 XTF_SUPPORTS_PARQUET=true（需确认所部署的 XTF 可读取 Parquet）"
+    elif not parquet_writer_available():
+        reason = "未安装 pyarrow"
+    else:
+        return "parquet"
+    print(f"⚠️ XTF_INPUT_FORMAT=parquet 但{reason}，回退为 xlsx")
+    return "xlsx"
+
+
+def _write_xtf_yaml(yaml_path: Path, xtf_cfg: Dict) -> None:
+    """
+    写入 XTF 配置 YAML。任务配置不变时各次运行生成的 YAML 完全相同，
+    因此以配置摘要（旁路文件 <yaml>.hash）判断，未变化则跳过序列化与写盘。
+    """
+    digest = hashlib.blake2b(json.dumps(xtf_cfg, sort_keys=True, default=str).encode("utf-8"), digest_size=8).hexdigest()
+    hash_path = yaml_path.with_name(yaml_path.name + ".hash")
+    try:
+        if yaml_path.exists() and hash_path.read_text(encoding="utf-8") == digest:
+            return
+    except OSError:
+        pass
+    # 与 CLI 共用同一 Dumper 选择（优先 libyaml 的 C 实现）
+    from mysql_to_bitable import _SafeDumper, yaml
+
+    if yaml is None:
+        raise RuntimeError("缺少 pyyaml，请先: pip install pyyaml")
+    yaml_path.write_text(yaml.dump(xtf_cfg, Dumper=_SafeDumper, allow_unicode=True, sort_keys=False), encoding="utf-8")
+    hash_path.write_text(digest, encoding="utf-8")
+
+
+# 任务锁专用 Engine：锁连接要持有整个任务期间，若取自 ENGINE 连接池，并发任务会占满连接池，
+# 导致读库与 Web 请求等待超时；NullPool 不做池化，关闭即断开（断开同时释放命名锁）
+_LOCK_ENGINE = create_engine(CONFIG.mysql.sqlalchemy_url(), poolclass=NullPool)
+
+
+@contextmanager
+def _task_lock(task_id: int) -> Iterator[bool]:
+    """
+    基于 MySQL 命名锁（GET_LOCK）的同任务互斥，产出是否拿到锁。
+    命名锁绑定在数据库连接上，因此单独占用一条连接直到任务结束（Session 的连接在 commit 后会归还连接池）；
+    该连接来自独立的 _LOCK_ENGINE，不占用 ENGINE 连接池。
+    无需锁文件，跨平台，且对多进程/多机部署（如 Celery worker）同样有效。
+    """
+    key = f"mtb_task_{task_id}"
+    conn = _LOCK_ENGINE.connect()
+    acquired = False
+    try:
+        acquired = conn.execute(text("SELECT GET_LOCK(:k, 0)"), {"k": key}).scalar() == 1
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                conn.execute(text("SELECT RELEASE_LOCK(:k)"), {"k": key})
+            except Exception:
+                # 释放失败也无妨：下方 close 会断开连接，命名锁随之释放
+                pass
+        conn.close()
+
+
+def run_task(task_id: int, async_webhook: bool = True) -> None:
     session = SessionLocal()
-    task = session.query(SyncTask).get(task_id)
+    task = session.get(SyncTask, task_id)
     if not task:
+        SessionLocal.remove()
         return
 
-    # 基于 task_id 的文件锁，避免同任务并发
-    # run_dir = Path(CONFIG.runtime_dir)
-    # run_dir.mkdir(parents=True, exist_ok=True)
-    # lock_path = run_dir / f".lock_task_{task.id}"
-    # lock_file = None
+    try:
+        with _task_lock(task.id) as acquired:
+            # 未拿到锁说明同任务正在执行：直接返回不写日志，避免重复记录
+            if acquired:
+                _run_task_locked(session, task, async_webhook)
+    finally:
+        # 调度线程会被复用，结束时移除线程级 Session，避免下次运行读到过期的任务配置
+        SessionLocal.remove()
+
+
+def _run_task_locked(session, task: SyncTask, async_webhook: bool = True) -> None:
+    from mysql_to_bitable import (
+        read_mysql_to_df,
+        run_xtf_with_config,
+        write_temp_excel,
+        write_temp_parquet,
+    )
+
     BASE_DIR = Path(__file__).parent.absolute()  # 当前脚本的绝对目录
     run_dir = BASE_DIR / CONFIG.runtime_dir       # 拼接你的配置目录(runs)，绝对路径！
-    run_dir.mkdir(parents=True, exist_ok=True)   # 你的原始代码，参数完全正确
-    # 2. 基于task.id生成唯一锁文件，防止同任务并发执行，保留你的核心逻辑
-    lock_path = run_dir / f".lock_task_{task.id}"
-    lock_file = None  # 初始化锁文件句柄
+    run_dir.mkdir(parents=True, exist_ok=True)
 
-    # 3. 【补充你的文件锁核心逻辑】 加锁逻辑（你大概率漏了这部分，必须加）  
-    try:
-        lock_file = open(lock_path, "w")
-        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
-    except BlockingIOError:
-        # 已有同任务在执行，直接返回不写日志，避免重复记录
-        session.close()
-        try:
-            if lock_file:
-                lock_file.close()
-        except Exception:
-            pass
-        return
-
-    # 记录日志开始
+    # 记录日志开始（立即提交：进程中途崩溃时仍可看到 running 记录）
     log = SyncLog(task_id=task.id, task_name=task.name, start_time=now_cn_naive(), status="running", message="start")
     session.add(log)
     session.commit()
-    log_id = log.id
 
     # 改为每个任务复用固定产物文件，避免每次生成新的 YAML/Excel
-    excel_path = run_dir / f"task_{task.id}.xlsx"
+    # 配置为 parquet 且 XTF 支持读取时，跳过 xlsx 的序列化/反序列化
+    use_parquet = _xtf_input_format() == "parquet"
+    data_path = run_dir / f"task_{task.id}.{'parquet' if use_parquet else 'xlsx'}"
     yaml_path = run_dir / f"task_{task.id}.yaml"
 
     try:
+        # 飞书链接每次运行只解析一次，生成 XTF 配置与成功摘要共用
+        parsed_link = _parse_feishu_link(task.feishu_link or "")
         # 1) 读 MySQL（全局写死配置），使用任务的 SQL
-        mysql_uri = f"mysql+pymysql://{CONFIG.mysql.username}:{CONFIG.mysql.password}@{CONFIG.mysql.host}:{CONFIG.mysql.port}/{CONFIG.mysql.database}?charset=utf8mb4"
-        df = read_mysql_to_df(mysql_uri, CONFIG.mysql.database, table=None, sql=str(task.sql_text))
+        #    任务库与应用库为同一 MySQL 配置，直接复用 models.ENGINE 的连接池
+        #    分块读取，每块处理后即写入 Excel，内存占用与结果集大小无关
+        frames = read_mysql_to_df(
+            ENGINE, CONFIG.mysql.database, table=None, sql=str(task.sql_text), chunksize=READ_CHUNK_ROWS
+        )
 
-        # 1.1) 时区修复：将所有时间列转换为字符串格式，防止 Excel/飞书 转换时出现时区偏差
-        for col in df.columns:
-            if pd.api.types.is_datetime64_any_dtype(df[col]):
-                df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
-
-        # 2) 导出 Excel
-        write_temp_excel(df, excel_path)
+        # 2) 导出 Excel / Parquet（逐块做时区修复后写入）
+        fixed_frames = (_fix_datetime_columns(df) for df in frames)
+        if use_parquet:
+            row_count = write_temp_parquet(fixed_frames, data_path)
+        else:
+            row_count = write_temp_excel(fixed_frames, data_path)
         # 3) 生成 XTF 配置 YAML（不含 source，基于链接解析）
-        xtf_cfg = _build_xtf_yaml_dict(task, excel_path)
-        yaml_path.write_text(yaml.safe_dump(xtf_cfg, allow_unicode=True, sort_keys=False), encoding="utf-8")
+        xtf_cfg = _build_xtf_yaml_dict(task, data_path, parsed=parsed_link)
+        _write_xtf_yaml(yaml_path, xtf_cfg)
         # 4) 调用 XTF 执行
-        rc, ok, output = run_xtf_with_config(yaml_path)
+        rc, ok, output, permission_denied = run_xtf_with_config(yaml_path)
         if ok:
             status = "success"
-            message = f"同步成功: 行数={len(df)}, 模式={task.sync_mode}, 目标={_display_target_from_link(task.feishu_link)}"
+            message = f"同步成功: 行数={row_count}, 模式={task.sync_mode}, 目标={_display_target_from_link(task.feishu_link, parsed=parsed_link)}"
         else:
             status = "fail"
             # 返回部分关键输出帮助定位
+            # output 已是 run_xtf_with_config 保留的尾部（≤200 行），直接切片即可
             tail = (output or "").splitlines()[-10:]
             tail_text = " | ".join(tail) if tail else "失败，详见控制台/日志"
             # 特定错误的人性化摘要（权限类）
-            lower_out = (output or "").lower()
-            out_text = output or ""
-            permission_error = (
-                ("91403" in out_text)
-                or ("1254302" in out_text)
-                or ("forbidden" in lower_out)
-                or ("no permissions" in lower_out)
-                or ("the role has no permissions" in lower_out)
-            )
-            if permission_error:
+            if permission_denied:
                 human_summary = "暂无权限——当前应用/机器人对目标多维表没有足够权限（读取/创建字段）。请在多维表中邀请该机器人并授予编辑或管理员权限"
                 message = f"{human_summary} | XTF 返回码 {rc}; {tail_text}"
             else:
@@ -242,33 +416,56 @@ def run_task(task_id: int) -> None:
         status = "fail"
         message = f"异常: {e}\n{traceback.format_exc()}"
 
-    # 更新日志与任务状态
-    log = session.query(SyncLog).get(log_id)
-    log.end_time = now_cn_naive()
+    # 更新日志与任务状态（log/task 仍在当前 Session 中，直接修改即可，无需重新查询）
+    end = now_cn_naive()
+    log.end_time = end
     log.status = status
     log.message = message
     task.last_run_status = status
-    task.updated_at = now_cn_naive()
+    task.updated_at = end
     session.commit()
 
-    # 失败告警（带回执）
+    # 失败告警（带回执）：交给后台线程发送，任务不必等待飞书响应；
+    # 须在结果提交之后入队，后台线程追加的 Webhook 失败信息才不会被本次提交覆盖
     if status != "success":
-        ok_webhook, info_webhook = _send_webhook(f"[DataSync] 任务失败: {task.name} - {message}")
-        if not ok_webhook:
-            # 追加Webhook失败信息到日志，便于定位
-            log = session.query(SyncLog).get(log_id)
-            log.message = (log.message or "") + f" | Webhook推送失败: {info_webhook}"
-            session.commit()
+        webhook_text = f"[DataSync] 任务失败: {task.name} - {message}"
+        if not (async_webhook and _enqueue_webhook(log.id, webhook_text)):
+            # 要求同步发送（Celery worker）或队列已满时，在当前线程直接发送
+            ok_webhook, info_webhook = _send_webhook(webhook_text)
+            if not ok_webhook:
+                # 追加Webhook失败信息到日志，便于定位
+                log.message = f"{log.message} | Webhook推送失败: {info_webhook}"
+                session.commit()
 
-    # 释放文件锁
-    try:
-        if lock_file:
-            fcntl.flock(lock_file, fcntl.LOCK_UN)
-            lock_file.close()
-        try:
-            lock_path.unlink()
-        except Exception:
-            pass
-    except Exception:
-        pass
 
+# 可选：Celery 分布式执行。安装 celery 且配置了 CELERY_BROKER_URL 时，调度器只负责投递，
+# 任务在独立的 worker 进程中并行执行（慢 SQL/XTF 不再占用调度线程，worker 崩溃也不影响调度器）。
+# 启动 worker：celery -A sync_runner.celery_app worker -Q mtb_sync --concurrency=4
+try:
+    from celery import Celery
+except Exception:
+    Celery = None
+
+celery_app = None
+if Celery is not None and CONFIG.celery_broker_url:
+    celery_app = Celery("mtb", broker=CONFIG.celery_broker_url, backend=CONFIG.celery_result_backend or None)
+    celery_app.conf.update(
+        task_default_queue=CONFIG.celery_queue,
+        # 长任务：执行完成后再确认，worker 每次只预取一个任务，避免任务积压在单个 worker 上
+        task_acks_late=True,
+        worker_prefetch_multiplier=1,
+        task_ignore_result=not CONFIG.celery_result_backend,
+    )
+
+    @celery_app.task(name="mtb.run_task", bind=True, acks_late=True)
+    def run_task_celery(self, task_id: int) -> None:
+        # worker 进程本就不占用调度线程，且可能在任务返回后被回收，告警直接同步发送，避免随进程退出丢失
+        run_task(task_id, async_webhook=False)
+
+
+def dispatch_task(task_id: int) -> None:
+    """调度入口：已启用 Celery 时投递到队列，否则在当前调度线程内直接执行。"""
+    if celery_app is not None:
+        run_task_celery.delay(task_id)
+    else:
+        run_task(task_id)